@@ -6,13 +6,38 @@ Healthcare data engineering pipeline for processing EMR claim data
 
 import json
 import csv
-import pandas as pd
+import os
+import functools
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, Any, Optional
 import logging
 import re
+import sys
 from pathlib import Path
 
+try:
+    import ijson  # Streaming JSON parser, used for EMR Beta when available
+except ImportError:
+    ijson = None
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv  # Multi-threaded CSV reader, opt-in via use_arrow
+    from pyarrow import parquet as pq  # Parquet cache of ingested claims
+except ImportError:
+    pa = pacsv = pq = None
+
+try:
+    import orjson  # Fast JSON encoder, used for the output files when available
+except ImportError:
+    orjson = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -24,11 +49,197 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Columns of the EMR Alpha CSV export
+ALPHA_COLUMNS = ("claim_id", "patient_id", "procedure_code", "denial_reason", "submitted_at", "status")
+
+# Upper bound on the distinct denial reasons remembered by the per-reason caches
+REASON_CACHE_SIZE = 1024
+
+# Hardcoded classification of ambiguous denial reasons for demo purposes
+AMBIGUOUS_RETRYABLE = {
+    "form incomplete": True,
+    "incorrect procedure": True,  # Could be a simple coding error
+    "not billable": False,  # Usually a fundamental issue
+}
+
+# Simple heuristic: if it mentions "incomplete", "missing", "wrong" it might be retryable
+_HEURISTIC_RE = re.compile(r'(?:incomplete|missing|wrong|error|typo)', re.IGNORECASE)
+
+
+# Only a handful of distinct denial reasons occur across all claims, so
+# normalization is cached per reason rather than redone per claim. Reasons are
+# free text from external systems, so the cache is bounded.
+@functools.lru_cache(maxsize=REASON_CACHE_SIZE)
+def normalize_denial_reason(reason: str) -> str:
+    """Normalize denial reason text for consistent matching"""
+    if not reason:
+        return None
+    return sys.intern(reason.lower().strip())
+
+
+def classify_ambiguous_denial(reason: str) -> bool:
+    """
+    Mock LLM classifier for ambiguous denial reasons
+    In production, this would call an actual LLM API
+    """
+    if not reason:
+        return False
+        
+    if _HEURISTIC_RE.search(reason):
+        logger.info("Classified '%s' as retryable via heuristic", reason)
+        return True
+        
+    return AMBIGUOUS_RETRYABLE.get(reason.lower().strip(), False)
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_iso_date(date_str: str) -> datetime:
+    """
+    Parse an ISO date or datetime string
+    Many claims share a submission date, so parsed values are cached
+    """
+    # Handle ISO format
+    if 'T' in date_str:
+        return datetime.fromisoformat(date_str.replace('T', ' ').replace('Z', ''))
+    # Handle simple date format
+    return datetime.strptime(date_str, '%Y-%m-%d')
+
+def optional_str(value: Any) -> Optional[str]:
+    """Convert a possibly numeric source value to text, keeping None as None"""
+    return value if value is None or isinstance(value, str) else str(value)
+
+@dataclass(slots=True)
+class Claim:
+    """A claim normalized from either EMR source"""
+    claim_id: str
+    patient_id: Optional[str]
+    procedure_code: str
+    denial_reason: Optional[str]
+    status: str
+    submitted_at: Optional[datetime]
+    source_system: str
+    # Filled in by the eligibility check once the cheaper rules have passed
+    denial_reason_norm: Optional[str] = None
+
+# Claim fields stored in the Parquet cache, in Claim field order
+CACHE_COLUMNS = (
+    "claim_id", "patient_id", "procedure_code", "denial_reason", "status", "submitted_at", "source_system"
+)
+
+# Claims are written to the Parquet cache in row groups of this size
+CACHE_BATCH_SIZE = 65536
+
+# Parquet metadata key holding the cache's source fingerprint and ingestion counters
+CACHE_METADATA_KEY = b'claims_cache'
+# Bump when the cache layout or the way claims are ingested changes
+CACHE_FORMAT_VERSION = 1
+CACHED_METRICS = ('source_alpha_count', 'source_beta_count', 'malformed_records')
+
+class JsonArrayWriter:
+    """Write a JSON array one item at a time, indented by two spaces"""
+    
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.count = 0
+        self._file = None
+    
+    def __enter__(self):
+        self._file = open(self.file_path, 'wb')
+        self._file.write(b'[')
+        return self
+    
+    def write(self, item: Any):
+        """Append one item to the array"""
+        if orjson:
+            encoded = orjson.dumps(item, option=orjson.OPT_INDENT_2)
+        else:
+            encoded = json.dumps(item, indent=2).encode()
+        
+        # Nest the item one level inside the array
+        self._file.write(b',\n  ' if self.count else b'\n  ')
+        self._file.write(encoded.replace(b'\n', b'\n  '))
+        self.count += 1
+    
+    def __exit__(self, *exc_info):
+        self._file.write(b'\n]' if self.count else b']')
+        self._file.close()
+
+class PrefetchIterator:
+    """
+    Drain an iterator on a worker thread into a bounded buffer
+    Lets a source be read and parsed while earlier claims are still being evaluated
+    """
+    
+    _DONE = object()
+    
+    def __init__(self, records: Iterator, executor: ThreadPoolExecutor,
+                 chunk_size: int = 512, max_chunks: int = 8):
+        self._buffer = queue.Queue(max_chunks)
+        self._stop = threading.Event()
+        self._future = executor.submit(self._fill, records, chunk_size)
+    
+    def _fill(self, records: Iterator, chunk_size: int):
+        try:
+            # Hand records over in chunks to keep queue overhead off the per-record path
+            for chunk in iter(lambda: list(itertools.islice(records, chunk_size)), []):
+                if self._stop.is_set():
+                    return
+                self._buffer.put(chunk)
+        finally:
+            if not self._stop.is_set():
+                self._buffer.put(self._DONE)
+    
+    def __iter__(self):
+        while True:
+            chunk = self._buffer.get()
+            if chunk is self._DONE:
+                break
+            yield from chunk
+        # Surface any error raised on the worker thread
+        self._future.result()
+    
+    def close(self):
+        """Stop the worker, releasing it if it is blocked on a full buffer"""
+        self._stop.set()
+        while True:
+            try:
+                self._buffer.get_nowait()
+            except queue.Empty:
+                break
+
 class ClaimProcessor:
     """Main pipeline class for processing EMR claim data"""
     
-    def __init__(self):
-        self.unified_claims = []
+    # Known retryable and non-retryable denial reasons, interned so they match
+    # normalized reasons by identity
+    RETRYABLE_REASONS = frozenset(map(sys.intern, (
+        "missing modifier", "incorrect npi", "prior auth required"
+    )))
+    NON_RETRYABLE_REASONS = frozenset(map(sys.intern, (
+        "authorization expired", "incorrect provider type"
+    )))
+    
+    # Recommended changes for denial reasons with a known fix
+    RECOMMENDATIONS = {
+        "missing modifier": "Add the required modifier to the procedure code",
+        "incorrect npi": "Review and correct the NPI number",
+        "prior auth required": "Obtain prior authorization before resubmission",
+        "incorrect procedure": "Review and correct the procedure code",
+        "form incomplete": "Complete all required fields and resubmit"
+    }
+    
+    def __init__(self, use_arrow: bool = False, parallel_ingest: bool = False):
+        # Optional fast IO: read EMR Alpha CSV with PyArrow instead of the csv module
+        if use_arrow and pacsv is None:
+            logger.warning("pyarrow is not installed, reading CSV with the csv module")
+            use_arrow = False
+        self.use_arrow = use_arrow
+        
+        # Optionally read and parse both sources on worker threads
+        self.parallel_ingest = parallel_ingest
+        
+        # Ingestion counters can be updated from worker threads
+        self._metrics_lock = threading.Lock()
         self.metrics = {
             'total_processed': 0,
             'source_alpha_count': 0,
@@ -38,47 +249,29 @@ class ClaimProcessor:
             'malformed_records': 0
         }
         
-        # Known retryable and non-retryable denial reasons
-        self.retryable_reasons = {
-            "missing modifier", "incorrect npi", "prior auth required"
-        }
-        self.non_retryable_reasons = {
-            "authorization expired", "incorrect provider type"
-        }
+        # Set when a source could not be read at all, so a partial ingest is never cached
+        self.ingest_failed = False
+        
+        # Normalized denial reason -> (eligible, explanation, recommendation), built
+        # once for the known reasons; ambiguous reasons are added when first seen,
+        # up to REASON_CACHE_SIZE entries
+        self.reason_table = {}
+        for reason in self.RETRYABLE_REASONS | self.NON_RETRYABLE_REASONS:
+            self.reason_table[reason] = self.build_reason_entry(reason)
         
         # Current date for age calculation (as specified in requirements)
         self.current_date = datetime(2025, 7, 30)
+        
+        # Claims submitted after this are at most 7 full days old
+        self.age_cutoff = self.current_date - timedelta(days=8)
     
-    def normalize_denial_reason(self, reason: str) -> str:
-        """Normalize denial reason text for consistent matching"""
-        if not reason:
-            return None
-        return reason.lower().strip()
+    def count_metric(self, name: str, amount: int = 1):
+        """Increment an ingestion metric"""
+        with self._metrics_lock:
+            self.metrics[name] += amount
     
-    def classify_ambiguous_denial(self, reason: str) -> bool:
-        """
-        Mock LLM classifier for ambiguous denial reasons
-        In production, this would call an actual LLM API
-        """
-        if not reason:
-            return False
-            
-        reason_lower = reason.lower().strip()
-        
-        # Hardcoded classification for demo purposes
-        ambiguous_retryable = {
-            "form incomplete": True,
-            "incorrect procedure": True,  # Could be a simple coding error
-            "not billable": False,  # Usually a fundamental issue
-        }
-        
-        # Simple heuristic: if it mentions "incomplete", "missing", "wrong" it might be retryable
-        heuristic_keywords = ["incomplete", "missing", "wrong", "error", "typo"]
-        if any(keyword in reason_lower for keyword in heuristic_keywords):
-            logger.info(f"Classified '{reason}' as retryable via heuristic")
-            return True
-            
-        return ambiguous_retryable.get(reason_lower, False)
+    normalize_denial_reason = staticmethod(normalize_denial_reason)
+    classify_ambiguous_denial = staticmethod(classify_ambiguous_denial)
     
     def parse_date(self, date_str: str) -> Optional[datetime]:
         """Parse date string in various formats"""
@@ -86,168 +279,228 @@ class ClaimProcessor:
             return None
             
         try:
-            # Handle ISO format
-            if 'T' in date_str:
-                return datetime.fromisoformat(date_str.replace('T', ' ').replace('Z', ''))
-            # Handle simple date format
-            return datetime.strptime(date_str, '%Y-%m-%d')
+            if not isinstance(date_str, str):
+                raise TypeError(f"expected a string, got {type(date_str).__name__}")
+            return parse_iso_date(date_str)
         except (ValueError, TypeError) as e:
-            logger.warning(f"Failed to parse date '{date_str}': {e}")
+            logger.warning("Failed to parse date '%s': %s", date_str, e)
             return None
     
-    def ingest_csv_source(self, file_path: str) -> List[Dict]:
-        """Ingest and normalize CSV data from EMR Alpha"""
+    def read_csv_rows(self, file_path: str) -> Iterator[Dict]:
+        """Yield CSV rows as dicts keyed by column name"""
+        if self.use_arrow:
+            read_options = pacsv.ReadOptions(block_size=1 << 20, use_threads=True)
+            # Every field is normalized as text, so skip type and null inference and
+            # hand back the raw strings exactly like csv.DictReader does
+            convert_options = pacsv.ConvertOptions(
+                column_types={column: pa.string() for column in ALPHA_COLUMNS},
+                strings_can_be_null=False
+            )
+            # Skip rows with the wrong number of fields, counting them like the csv path
+            # does, instead of letting one bad row abort the whole file
+            parse_options = pacsv.ParseOptions(invalid_row_handler=self.skip_invalid_csv_row)
+            batches = pacsv.open_csv(file_path, read_options=read_options,
+                                     parse_options=parse_options, convert_options=convert_options)
+            for batch in batches:
+                yield from batch.to_pylist()
+        else:
+            # utf-8-sig strips a leading BOM, which would otherwise end up in the first column name
+            with open(file_path, newline='', encoding='utf-8-sig') as f:
+                yield from csv.DictReader(f)
+    
+    def skip_invalid_csv_row(self, row) -> str:
+        """Log and count a CSV row PyArrow could not split into the expected columns"""
+        logger.error("Malformed CSV row: %r, Error: expected %d columns, got %d",
+                     row.text, row.expected_columns, row.actual_columns)
+        self.count_metric('malformed_records')
+        return 'skip'
+    
+    def create_sample_csv(self, file_path: str):
+        """Create sample EMR Alpha CSV data if the file doesn't exist"""
+        if not Path(file_path).exists():
+            logger.info("Creating sample CSV data")
+            sample_data = [
+                ",".join(ALPHA_COLUMNS),
+                "A123,P001,99213,Missing modifier,2025-07-01,denied",
+                "A124,P002,99214,Incorrect NPI,2025-07-10,denied",
+                "A125,,99215,Authorization expired,2025-07-05,denied",
+                "A126,P003,99381,None,2025-07-15,approved",
+                "A127,P004,99401,Prior auth required,2025-07-20,denied"
+            ]
+            with open(file_path, 'w') as f:
+                f.write('\n'.join(sample_data))
+    
+    def ingest_csv_source(self, file_path: str) -> Iterator[Claim]:
+        """Ingest and normalize CSV data from EMR Alpha, yielding records as they are parsed"""
         try:
-            logger.info(f"Processing CSV source: {file_path}")
+            logger.info("Processing CSV source: %s", file_path)
             
             # Create sample data if file doesn't exist
-            if not Path(file_path).exists():
-                logger.info("Creating sample CSV data")
-                sample_data = [
-                    "claim_id,patient_id,procedure_code,denial_reason,submitted_at,status",
-                    "A123,P001,99213,Missing modifier,2025-07-01,denied",
-                    "A124,P002,99214,Incorrect NPI,2025-07-10,denied",
-                    "A125,,99215,Authorization expired,2025-07-05,denied",
-                    "A126,P003,99381,None,2025-07-15,approved",
-                    "A127,P004,99401,Prior auth required,2025-07-20,denied"
-                ]
-                with open(file_path, 'w') as f:
-                    f.write('\n'.join(sample_data))
+            self.create_sample_csv(file_path)
             
-            df = pd.read_csv(file_path)
-            records = []
-            
-            for _, row in df.iterrows():
+            for row in self.read_csv_rows(file_path):
                 try:
+                    # csv.DictReader keeps extra fields under a None key; reject such
+                    # rows like PyArrow does so both readers accept the same rows
+                    if None in row:
+                        raise ValueError(f"expected {len(row) - 1} columns, "
+                                         f"got {len(row) - 1 + len(row[None])}")
+                    
                     # Handle 'None' string as null
                     denial_reason = row.get('denial_reason')
-                    if denial_reason == 'None' or pd.isna(denial_reason):
+                    if denial_reason is None or denial_reason == '' or denial_reason == 'None':
                         denial_reason = None
                     
                     # Handle empty patient_id
                     patient_id = row.get('patient_id')
-                    if pd.isna(patient_id) or patient_id == '':
+                    if patient_id is None or patient_id == '':
                         patient_id = None
                     
-                    record = {
-                        'claim_id': str(row['claim_id']),
-                        'patient_id': patient_id,
-                        'procedure_code': str(row['procedure_code']),
-                        'denial_reason': denial_reason,
-                        'status': str(row['status']).lower(),
-                        'submitted_at': self.parse_date(str(row['submitted_at'])),
-                        'source_system': 'alpha'
-                    }
-                    records.append(record)
-                    self.metrics['source_alpha_count'] += 1
+                    # Both CSV readers hand back every field as a string already
+                    record = Claim(
+                        claim_id=row['claim_id'],
+                        patient_id=patient_id,
+                        procedure_code=row['procedure_code'],
+                        denial_reason=denial_reason,
+                        status=row['status'].lower(),
+                        submitted_at=self.parse_date(row['submitted_at']),
+                        source_system='alpha'
+                    )
+                    self.count_metric('source_alpha_count')
+                    yield record
                     
                 except Exception as e:
-                    logger.error(f"Malformed record in CSV: {row.to_dict()}, Error: {e}")
-                    self.metrics['malformed_records'] += 1
-            
-            return records
+                    logger.error("Malformed CSV row: %r, Error: %s", row, e)
+                    self.count_metric('malformed_records')
             
         except Exception as e:
-            logger.error(f"Failed to process CSV source: {e}")
-            return []
+            logger.error("Failed to process CSV source: %s", e)
+            self.ingest_failed = True
+    
+    def create_sample_json(self, file_path: str):
+        """Create sample EMR Beta JSON data if the file doesn't exist"""
+        if not Path(file_path).exists():
+            logger.info("Creating sample JSON data")
+            sample_data = [
+                {
+                    "id": "B987",
+                    "member": "P010",
+                    "code": "99213",
+                    "error_msg": "Incorrect provider type",
+                    "date": "2025-07-03T00:00:00",
+                    "status": "denied"
+                },
+                {
+                    "id": "B988",
+                    "member": "P011",
+                    "code": "99214",
+                    "error_msg": "Missing modifier",
+                    "date": "2025-07-09T00:00:00",
+                    "status": "denied"
+                },
+                {
+                    "id": "B989",
+                    "member": "P012",
+                    "code": "99215",
+                    "error_msg": None,
+                    "date": "2025-07-10T00:00:00",
+                    "status": "approved"
+                },
+                {
+                    "id": "B990",
+                    "member": None,
+                    "code": "99401",
+                    "error_msg": "incorrect procedure",
+                    "date": "2025-07-01T00:00:00",
+                    "status": "denied"
+                }
+            ]
+            with open(file_path, 'w') as f:
+                json.dump(sample_data, f, indent=2)
     
-    def ingest_json_source(self, file_path: str) -> List[Dict]:
-        """Ingest and normalize JSON data from EMR Beta"""
+    def ingest_json_source(self, file_path: str) -> Iterator[Claim]:
+        """Ingest and normalize JSON data from EMR Beta, yielding records as they are parsed"""
         try:
-            logger.info(f"Processing JSON source: {file_path}")
+            logger.info("Processing JSON source: %s", file_path)
             
             # Create sample data if file doesn't exist
-            if not Path(file_path).exists():
-                logger.info("Creating sample JSON data")
-                sample_data = [
-                    {
-                        "id": "B987",
-                        "member": "P010",
-                        "code": "99213",
-                        "error_msg": "Incorrect provider type",
-                        "date": "2025-07-03T00:00:00",
-                        "status": "denied"
-                    },
-                    {
-                        "id": "B988",
-                        "member": "P011",
-                        "code": "99214",
-                        "error_msg": "Missing modifier",
-                        "date": "2025-07-09T00:00:00",
-                        "status": "denied"
-                    },
-                    {
-                        "id": "B989",
-                        "member": "P012",
-                        "code": "99215",
-                        "error_msg": None,
-                        "date": "2025-07-10T00:00:00",
-                        "status": "approved"
-                    },
-                    {
-                        "id": "B990",
-                        "member": None,
-                        "code": "99401",
-                        "error_msg": "incorrect procedure",
-                        "date": "2025-07-01T00:00:00",
-                        "status": "denied"
-                    }
-                ]
-                with open(file_path, 'w') as f:
-                    json.dump(sample_data, f, indent=2)
+            self.create_sample_json(file_path)
             
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-            
-            records = []
-            for item in data:
-                try:
-                    record = {
-                        'claim_id': str(item['id']),
-                        'patient_id': item.get('member'),  # Can be None
-                        'procedure_code': str(item['code']),
-                        'denial_reason': item.get('error_msg'),  # Can be None
-                        'status': str(item['status']).lower(),
-                        'submitted_at': self.parse_date(item['date']),
-                        'source_system': 'beta'
-                    }
-                    records.append(record)
-                    self.metrics['source_beta_count'] += 1
-                    
-                except Exception as e:
-                    logger.error(f"Malformed record in JSON: {item}, Error: {e}")
-                    self.metrics['malformed_records'] += 1
-            
-            return records
+            with open(file_path, 'rb') as f:
+                # Stream one array item at a time rather than loading the whole export
+                items = ijson.items(f, 'item') if ijson else json.load(f)
+                
+                for item in items:
+                    try:
+                        record = Claim(
+                            claim_id=str(item['id']),
+                            patient_id=optional_str(item.get('member')),  # Can be None
+                            procedure_code=str(item['code']),
+                            denial_reason=optional_str(item.get('error_msg')),  # Can be None
+                            status=str(item['status']).lower(),
+                            submitted_at=self.parse_date(item['date']),
+                            source_system='beta'
+                        )
+                        self.count_metric('source_beta_count')
+                        yield record
+                        
+                    except Exception as e:
+                        logger.error("Malformed JSON record: %r, Error: %s", item, e)
+                        self.count_metric('malformed_records')
             
         except Exception as e:
-            logger.error(f"Failed to process JSON source: {e}")
-            return []
+            logger.error("Failed to process JSON source: %s", e)
+            self.ingest_failed = True
     
-    def is_eligible_for_resubmission(self, claim: Dict) -> tuple[bool, str]:
+    def is_eligible_for_resubmission(self, claim: Claim) -> tuple[bool, str]:
         """
         Determine if a claim is eligible for resubmission based on business rules
         Returns (eligible, reason)
         """
         # Rule 1: Status must be denied
-        if claim['status'] != 'denied':
-            return False, f"Status is '{claim['status']}', not denied"
+        if claim.status != 'denied':
+            return False, f"Status is '{claim.status}', not denied"
         
         # Rule 2: Patient ID must not be null
-        if not claim['patient_id']:
+        if not claim.patient_id:
             return False, "Patient ID is null"
         
         # Rule 3: Claim must be older than 7 days
-        if not claim['submitted_at']:
+        if not claim.submitted_at:
             return False, "Submitted date is null"
         
-        days_old = (self.current_date - claim['submitted_at']).days
-        if days_old <= 7:
+        if claim.submitted_at > self.age_cutoff:
+            days_old = (self.current_date - claim.submitted_at).days
             return False, f"Claim is only {days_old} days old (need >7)"
         
         # Rule 4: Denial reason must be retryable
-        denial_reason = self.normalize_denial_reason(claim['denial_reason'])
-        
+        claim.denial_reason_norm = self.normalize_denial_reason(claim.denial_reason)
+        eligible, explanation, _ = self.lookup_denial_reason(claim.denial_reason_norm)
+        return eligible, explanation
+    
+    def lookup_denial_reason(self, denial_reason: Optional[str]) -> tuple[bool, str, Optional[str]]:
+        """
+        Look up a normalized denial reason in the reason table, adding it on first sight
+        while the table has room
+        Returns (eligible, reason, recommendation)
+        """
+        entry = self.reason_table.get(denial_reason)
+        if entry is None:
+            entry = self.build_reason_entry(denial_reason)
+            if len(self.reason_table) < REASON_CACHE_SIZE:
+                self.reason_table[denial_reason] = entry
+        return entry
+    
+    def build_reason_entry(self, denial_reason: Optional[str]) -> tuple[bool, str, Optional[str]]:
+        """Build the reason table entry for a normalized denial reason"""
+        eligible, explanation = self.evaluate_denial_reason(denial_reason)
+        return eligible, explanation, self.RECOMMENDATIONS.get(denial_reason)
+    
+    def evaluate_denial_reason(self, denial_reason: Optional[str]) -> tuple[bool, str]:
+        """
+        Decide whether a normalized denial reason is retryable
+        Returns (eligible, reason)
+        """
         if not denial_reason:
             # Null denial reason - classify as ambiguous
             if self.classify_ambiguous_denial(denial_reason):
@@ -256,11 +509,11 @@ class ClaimProcessor:
                 return False, "Null denial reason classified as non-retryable"
         
         # Check known retryable reasons
-        if denial_reason in self.retryable_reasons:
+        if denial_reason in self.RETRYABLE_REASONS:
             return True, f"Known retryable reason: '{denial_reason}'"
         
         # Check known non-retryable reasons
-        if denial_reason in self.non_retryable_reasons:
+        if denial_reason in self.NON_RETRYABLE_REASONS:
             return False, f"Known non-retryable reason: '{denial_reason}'"
         
         # Ambiguous - use classifier
@@ -269,69 +522,246 @@ class ClaimProcessor:
         else:
             return False, f"Ambiguous reason '{denial_reason}' classified as non-retryable"
     
-    def generate_recommended_changes(self, claim: Dict) -> str:
+    def generate_recommended_changes(self, claim: Claim) -> str:
         """Generate recommended changes for resubmission"""
-        denial_reason = claim['denial_reason']
+        denial_reason = claim.denial_reason
         if not denial_reason:
             return "Review claim details and resubmit with corrections"
         
-        reason_lower = denial_reason.lower()
+        # Reuse the reason normalized by the eligibility check when there is one
+        denial_reason_norm = claim.denial_reason_norm
+        if denial_reason_norm is None:
+            denial_reason_norm = self.normalize_denial_reason(denial_reason)
         
-        recommendations = {
-            "missing modifier": "Add the required modifier to the procedure code",
-            "incorrect npi": "Review and correct the NPI number",
-            "prior auth required": "Obtain prior authorization before resubmission",
-            "incorrect procedure": "Review and correct the procedure code",
-            "form incomplete": "Complete all required fields and resubmit"
-        }
+        recommendation = self.lookup_denial_reason(denial_reason_norm)[2]
+        return recommendation or f"Review and correct: {denial_reason}"
+    
+    def source_fingerprint(self, *source_paths: str) -> Optional[list]:
+        """Identify source files by resolved path, modification time and size"""
+        fingerprint = []
+        for path in source_paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            fingerprint.append([str(Path(path).resolve()), stat.st_mtime_ns, stat.st_size])
+        return fingerprint
+    
+    def cache_key(self, fingerprint: list) -> Dict:
+        """Describe what a claims cache was built from: format, ingestion settings and sources"""
+        return {'version': CACHE_FORMAT_VERSION, 'use_arrow': self.use_arrow, 'sources': fingerprint}
+    
+    def read_cache_metadata(self, cache_path: str, fingerprint: list) -> Optional[Dict]:
+        """
+        Return the claims cache metadata if the cache was built with the current
+        settings from exactly these source files in their current state, otherwise None
+        """
+        if not Path(cache_path).exists():
+            return None
+        try:
+            metadata = json.loads(pq.read_metadata(cache_path).metadata[CACHE_METADATA_KEY])
+            if not isinstance(metadata, dict):
+                raise ValueError("cache metadata is not a JSON object")
+        except Exception as e:
+            logger.warning("Ignoring unreadable claims cache %s: %s", cache_path, e)
+            return None
+        
+        key = self.cache_key(fingerprint)
+        if any(metadata.get(name) != value for name, value in key.items()):
+            return None
         
-        return recommendations.get(reason_lower, f"Review and correct: {denial_reason}")
+        try:
+            self.validate_claims_cache(cache_path, metadata)
+        except Exception as e:
+            logger.warning("Ignoring corrupt claims cache %s: %s", cache_path, e)
+            return None
+        return metadata
     
-    def process_pipeline(self, csv_path: str = "emr_alpha.csv", json_path: str = "emr_beta.json"):
-        """Main pipeline execution"""
-        logger.info("Starting claim resubmission pipeline")
+    def validate_claims_cache(self, cache_path: str, metadata: Dict):
+        """
+        Raise if the claims cache cannot be read back in full
+        Runs before any output is written, so a bad cache falls back to a fresh ingest
+        instead of failing part way through the run
+        """
+        metrics = metadata.get('metrics')
+        if not isinstance(metrics, dict) or not all(
+                isinstance(metrics.get(name), int) for name in CACHED_METRICS):
+            raise ValueError("cache metadata has no ingestion counters")
+        
+        parquet_file = pq.ParquetFile(cache_path, memory_map=True)
+        missing = set(CACHE_COLUMNS) - set(parquet_file.schema_arrow.names)
+        if missing:
+            raise ValueError(f"cache is missing columns: {sorted(missing)}")
+        
+        # Decode every row group once; a row group at a time keeps memory bounded
+        for index in range(parquet_file.num_row_groups):
+            parquet_file.read_row_group(index, columns=list(CACHE_COLUMNS))
+    
+    def read_claims_cache(self, cache_path: str, metadata: Dict) -> Iterator[Claim]:
+        """Load previously ingested claims from the Parquet cache"""
+        logger.info("Loading claims from cache: %s", cache_path)
+        
+        # Restore the ingestion counters recorded when the cache was built
+        for name in CACHED_METRICS:
+            self.count_metric(name, metadata['metrics'][name])
+        
+        parquet_file = pq.ParquetFile(cache_path, memory_map=True)
+        for batch in parquet_file.iter_batches(columns=list(CACHE_COLUMNS)):
+            columns = batch.to_pydict()
+            yield from itertools.starmap(Claim, zip(*(columns[name] for name in CACHE_COLUMNS)))
+    
+    def write_claims_cache(self, claims: Iterator[Claim], cache_path: str,
+                           source_paths: tuple[str, ...], fingerprint: list) -> Iterator[Claim]:
+        """
+        Pass claims through while saving them to the Parquet cache
+        fingerprint is taken before the sources are read; the cache only replaces an
+        older one once every claim has been written and the sources are unchanged
+        """
+        schema = pa.schema([
+            (name, pa.timestamp('us') if name == 'submitted_at' else pa.string())
+            for name in CACHE_COLUMNS
+        ])
+        temp_path = f"{cache_path}.tmp"
+        writer = None
+        batch = []
+        
+        def flush() -> bool:
+            columns = {name: [getattr(claim, name) for claim in batch] for name in CACHE_COLUMNS}
+            batch.clear()
+            try:
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                return True
+            except Exception as e:
+                logger.warning("Failed to write claims cache, caching disabled: %s", e)
+                return False
+        
+        try:
+            writer = pq.ParquetWriter(temp_path, schema)
+        except Exception as e:
+            logger.warning("Failed to create claims cache, caching disabled: %s", e)
+        caching = writer is not None
+        
+        try:
+            for claim in claims:
+                if caching:
+                    batch.append(claim)
+                    if len(batch) == CACHE_BATCH_SIZE:
+                        caching = flush()
+                yield claim
+            
+            if caching and self.ingest_failed:
+                logger.warning("Not saving claims cache because a source failed to load")
+            elif caching and self.source_fingerprint(*source_paths) != fingerprint:
+                logger.warning("Not saving claims cache because a source changed while it was read")
+            elif caching and (not batch or flush()):
+                try:
+                    # Record which sources the cache was built from and what ingestion counted
+                    writer.add_key_value_metadata({CACHE_METADATA_KEY: json.dumps({
+                        **self.cache_key(fingerprint),
+                        'metrics': {name: self.metrics[name] for name in CACHED_METRICS}
+                    })})
+                    writer.close()
+                    os.replace(temp_path, cache_path)
+                    logger.info("Saved claims cache: %s", cache_path)
+                except Exception as e:
+                    logger.warning("Failed to save claims cache: %s", e)
+        finally:
+            # Discard a partial cache if the run stopped early or caching failed
+            if writer is not None:
+                try:
+                    writer.close()
+                except Exception as e:
+                    logger.warning("Failed to close claims cache writer: %s", e)
+            if Path(temp_path).exists():
+                try:
+                    os.remove(temp_path)
+                except Exception as e:
+                    logger.warning("Failed to remove partial claims cache %s: %s", temp_path, e)
+    
+    def load_claims(self, stack: ExitStack, csv_path: str, json_path: str,
+                    cache_path: Optional[str]) -> Iterator[Claim]:
+        """Read claims from the Parquet cache when it is fresh, otherwise from both EMR sources"""
+        fingerprint = None
+        if cache_path and pq:
+            # Create any sample data first, so the fingerprint describes the files about
+            # to be read; if this fails the ingestors retry and log the error
+            try:
+                self.create_sample_csv(csv_path)
+                self.create_sample_json(json_path)
+            except Exception:
+                pass
+            fingerprint = self.source_fingerprint(csv_path, json_path)
+        
+        metadata = fingerprint and self.read_cache_metadata(cache_path, fingerprint)
+        if metadata:
+            return self.read_claims_cache(cache_path, metadata)
         
         # Ingest from both sources
+        self.ingest_failed = False
         csv_records = self.ingest_csv_source(csv_path)
         json_records = self.ingest_json_source(json_path)
         
-        # Combine all records
-        self.unified_claims = csv_records + json_records
-        self.metrics['total_processed'] = len(self.unified_claims)
+        if self.parallel_ingest:
+            # Both sources are parsed concurrently and handed over in order
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=2))
+            csv_records = PrefetchIterator(csv_records, executor)
+            json_records = PrefetchIterator(json_records, executor)
+            stack.callback(csv_records.close)
+            stack.callback(json_records.close)
+        
+        # Chain both sources so records flow through one at a time
+        claims = itertools.chain(csv_records, json_records)
+        
+        if fingerprint:
+            claims = self.write_claims_cache(claims, cache_path, (csv_path, json_path), fingerprint)
+            stack.callback(claims.close)
+        return claims
+    
+    def process_pipeline(self, csv_path: str = "emr_alpha.csv", json_path: str = "emr_beta.json",
+                         cache_path: Optional[str] = "claims_cache.parquet"):
+        """
+        Main pipeline execution
+        Ingested claims are cached in cache_path (when pyarrow is installed) and reused
+        while both source files are unchanged; pass cache_path=None to always ingest
+        """
+        logger.info("Starting claim resubmission pipeline")
         
-        logger.info(f"Processed {len(self.unified_claims)} total claims")
+        # Counters are incremented as claims stream through, so start each run from zero
+        self.metrics = dict.fromkeys(self.metrics, 0)
         
-        # Determine resubmission eligibility
+        # Determine resubmission eligibility, writing each claim out as it is classified.
+        # Candidates are also returned to the caller; excluded claims only go to disk.
         resubmission_candidates = []
-        excluded_claims = []
         
-        for claim in self.unified_claims:
-            eligible, reason = self.is_eligible_for_resubmission(claim)
+        with ExitStack() as stack:
+            claims = self.load_claims(stack, csv_path, json_path, cache_path)
             
-            if eligible:
-                candidate = {
-                    'claim_id': claim['claim_id'],
-                    'resubmission_reason': claim['denial_reason'] or 'Unknown',
-                    'source_system': claim['source_system'],
-                    'recommended_changes': self.generate_recommended_changes(claim)
-                }
-                resubmission_candidates.append(candidate)
-                self.metrics['resubmission_candidates'] += 1
-            else:
-                excluded_claims.append({
-                    'claim_id': claim['claim_id'],
-                    'exclusion_reason': reason,
-                    'source_system': claim['source_system']
-                })
-                self.metrics['excluded_claims'] += 1
-        
-        # Save output
-        with open('resubmission_candidates.json', 'w') as f:
-            json.dump(resubmission_candidates, f, indent=2)
+            candidates_out = stack.enter_context(JsonArrayWriter('resubmission_candidates.json'))
+            excluded_out = stack.enter_context(JsonArrayWriter('excluded_claims.json'))
+            
+            for claim in claims:
+                self.metrics['total_processed'] += 1
+                eligible, reason = self.is_eligible_for_resubmission(claim)
+                
+                if eligible:
+                    candidate = {
+                        'claim_id': claim.claim_id,
+                        'resubmission_reason': claim.denial_reason or 'Unknown',
+                        'source_system': claim.source_system,
+                        'recommended_changes': self.generate_recommended_changes(claim)
+                    }
+                    candidates_out.write(candidate)
+                    resubmission_candidates.append(candidate)
+                    self.metrics['resubmission_candidates'] += 1
+                else:
+                    excluded_out.write({
+                        'claim_id': claim.claim_id,
+                        'exclusion_reason': reason,
+                        'source_system': claim.source_system
+                    })
+                    self.metrics['excluded_claims'] += 1
         
-        # Save exclusion log
-        with open('excluded_claims.json', 'w') as f:
-            json.dump(excluded_claims, f, indent=2)
+        logger.info("Processed %d total claims", self.metrics['total_processed'])
         
         # Log metrics
         self.log_metrics()
@@ -341,12 +771,12 @@ class ClaimProcessor:
     def log_metrics(self):
         """Log pipeline execution metrics"""
         logger.info("=== PIPELINE METRICS ===")
-        logger.info(f"Total claims processed: {self.metrics['total_processed']}")
-        logger.info(f"Claims from Alpha EMR: {self.metrics['source_alpha_count']}")
-        logger.info(f"Claims from Beta EMR: {self.metrics['source_beta_count']}")
-        logger.info(f"Flagged for resubmission: {self.metrics['resubmission_candidates']}")
-        logger.info(f"Excluded from resubmission: {self.metrics['excluded_claims']}")
-        logger.info(f"Malformed records: {self.metrics['malformed_records']}")
+        logger.info("Total claims processed: %d", self.metrics['total_processed'])
+        logger.info("Claims from Alpha EMR: %d", self.metrics['source_alpha_count'])
+        logger.info("Claims from Beta EMR: %d", self.metrics['source_beta_count'])
+        logger.info("Flagged for resubmission: %d", self.metrics['resubmission_candidates'])
+        logger.info("Excluded from resubmission: %d", self.metrics['excluded_claims'])
+        logger.info("Malformed records: %d", self.metrics['malformed_records'])
         logger.info("========================")
 
 